@@ -1,21 +1,65 @@
 import os
-import json
-import uuid
+import io
+import orjson
+import hashlib
+import functools
+import secrets
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from flask import (Flask, request, jsonify, render_template, session,
-                   redirect, url_for, flash)
+                   redirect, url_for, flash, make_response)
+from flask.json.provider import DefaultJSONProvider
+from flask_compress import Compress
 from dotenv import load_dotenv
 import psycopg2
-from psycopg2.extras import DictCursor
+import psycopg2.errorcodes
+from psycopg2.extras import DictCursor, execute_values, register_default_jsonb
+from psycopg2.pool import ThreadedConnectionPool
 import cloudinary
 import cloudinary.uploader
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup
+from PIL import Image, ImageDraw, ImageFont
+
+# Redis é opcional: sem REDIS_URL os caches ficam na memória de cada processo
+try:
+    import redis
+except ImportError:
+    redis = None
 
 # Carrega variáveis de ambiente do arquivo .env
 load_dotenv()
 
+# Em produção use LOG_LEVEL=WARNING para silenciar as mensagens de rotina.
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO'),
+                    format='%(asctime)s %(levelname)s %(message)s')
+logger = logging.getLogger(__name__)
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Faz o jsonify (e request.get_json) usar o orjson no lugar do json da stdlib."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 # A SECRET_KEY é essencial. Certifique-se de que está configurada no Render.
 app.secret_key = os.getenv('SECRET_KEY', 'chave-super-secreta-para-teste-local')
 
+# Comprime HTML/JSON (brotli ou gzip, conforme o navegador aceitar); respostas
+# pequenas saem sem compressão porque o ganho não paga o custo
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_MIN_SIZE'] = 500
+Compress(app)
+
 # Configuração do Cloudinary
 cloudinary.config(
     cloud_name=os.getenv('CLOUDINARY_CLOUD_NAME'),
@@ -23,8 +67,23 @@ cloudinary.config(
     api_secret=os.getenv('CLOUDINARY_API_SECRET')
 )
 
+# Sessão HTTP compartilhada: reaproveita conexões TCP/TLS entre chamadas
+# (keep-alive) em vez de refazer o handshake a cada requests.get/post.
+SESSION = requests.Session()
+_http_adapter = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=64,
+    max_retries=Retry(total=3, backoff_factor=2, status_forcelist=(429, 500, 502, 503, 504))
+)
+SESSION.mount('http://', _http_adapter)
+SESSION.mount('https://', _http_adapter)
+SESSION.headers.update({'User-Agent': 'postgeral/1.0', 'Accept-Encoding': 'gzip'})
+
 # --- FUNÇÕES DE BANCO DE DADOS ---
 
+# Colunas JSONB (clientes.config) são decodificadas com orjson em todas as conexões
+register_default_jsonb(globally=True, loads=orjson.loads)
+
 def get_db_connection():
     """Cria e retorna uma nova conexão com o banco de dados."""
     conn_string = os.getenv('DATABASE_URL')
@@ -32,70 +91,440 @@ def get_db_connection():
         raise ValueError("ERRO CRÍTICO: A variável de ambiente DATABASE_URL não foi definida!")
     return psycopg2.connect(conn_string)
 
-def init_db():
-    """Inicializa o banco de dados e cria as tabelas se não existirem."""
-    conn = get_db_connection()
+# Pool de conexões compartilhado pelas rotas. É criado na primeira requisição
+# para que importar este módulo (ex.: auto_post.py) não abra conexões à toa.
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+# Uma conexão por thread do gunicorn. O ThreadedConnectionPool lança PoolError
+# (um psycopg2.Error) quando esgota em vez de esperar; o semáforo faz quem passar
+# do limite aguardar uma conexão ser devolvida.
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', os.getenv('GUNICORN_THREADS', 16)))
+_db_pool_vagas = threading.BoundedSemaphore(DB_POOL_MAX)
+
+def get_db_pool():
+    """Retorna o pool de conexões, criando-o na primeira chamada."""
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                conn_string = os.getenv('DATABASE_URL')
+                if not conn_string:
+                    raise ValueError("ERRO CRÍTICO: A variável de ambiente DATABASE_URL não foi definida!")
+                # Parâmetros fixos da sessão vão no handshake, não em SETs por requisição;
+                # o timeout evita que uma consulta travada segure um worker do painel.
+                _db_pool = ThreadedConnectionPool(
+                    minconn=1, maxconn=DB_POOL_MAX, dsn=conn_string,
+                    application_name='automacao-web',
+                    options='-c statement_timeout=5000',
+                )
+    return _db_pool
+
+@contextmanager
+def db_conn():
+    """Empresta uma conexão do pool e a devolve ao final do bloco."""
+    pool = get_db_pool()
+    with _db_pool_vagas:
+        conn = pool.getconn()
+        try:
+            yield conn
+        finally:
+            # O pool faz rollback de transações pendentes e descarta conexões fechadas.
+            pool.putconn(conn)
+
+def inserir_feeds(conn, linhas, ignorar_duplicados=False):
+    """Insere vários feeds num único comando e retorna quantos foram gravados.
+
+    `linhas` é uma lista de tuplas (cliente_id, nome, url, tipo, categoria).
+    Com `ignorar_duplicados`, URLs já cadastradas para o cliente são puladas
+    em vez de abortar o lote inteiro.
+    """
+    sql = "INSERT INTO feeds (cliente_id, nome, url, tipo, categoria) VALUES %s"
+    if ignorar_duplicados:
+        sql += " ON CONFLICT (cliente_id, url) DO NOTHING"
+    with conn.cursor() as cur:
+        inseridos = execute_values(cur, sql + " RETURNING id", linhas, page_size=500, fetch=True)
+    return len(inseridos)
+
+# Todo o esquema num único script, enviado ao banco em um só round-trip.
+ESQUEMA_DDL = '''
+    CREATE TABLE IF NOT EXISTS clientes (
+        id TEXT PRIMARY KEY,
+        nome TEXT NOT NULL UNIQUE,
+        config JSONB,
+        data_criacao TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS feeds (
+        id SERIAL PRIMARY KEY,
+        cliente_id TEXT NOT NULL REFERENCES clientes(id) ON DELETE CASCADE,
+        nome TEXT NOT NULL,
+        url TEXT NOT NULL,
+        tipo TEXT NOT NULL,
+        categoria TEXT
+    );
+    -- Atende o filtro por cliente e a ordenação do dashboard direto pelo índice
+    CREATE INDEX IF NOT EXISTS idx_feeds_cliente_nome ON feeds (cliente_id, nome);
+    -- ETag/Last-Modified da última busca de cada feed (GET condicional no auto_post)
+    CREATE TABLE IF NOT EXISTS feed_cache (
+        feed_id INTEGER PRIMARY KEY REFERENCES feeds(id) ON DELETE CASCADE,
+        etag TEXT,
+        last_modified TEXT
+    );
+'''
+
+# Cada URL só pode ser cadastrada uma vez por cliente. Duplicatas antigas não são
+# apagadas aqui: esta parte falha listando-as para serem removidas à mão, sem
+# impedir que o restante do esquema seja criado.
+ESQUEMA_UNICIDADE = '''
+    DO $$
+    DECLARE duplicados TEXT;
+    BEGIN
+        SELECT string_agg(format('%s: %s', cliente_id, url), '; ') INTO duplicados
+        FROM (SELECT cliente_id, url FROM feeds GROUP BY cliente_id, url HAVING count(*) > 1) d;
+        IF duplicados IS NOT NULL THEN
+            RAISE EXCEPTION 'Feeds duplicados impedem criar uq_feeds_cliente_url: %', duplicados;
+        END IF;
+    END $$;
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_feeds_cliente_url ON feeds (cliente_id, url);
+'''
+
+# Último objeto criado pelos scripts acima. Se ele já existe, o esquema está em dia e
+# o boot pula os scripts. Ao acrescentar um DDL, aponte este marcador para ele.
+ESQUEMA_MARCADOR = 'uq_feeds_cliente_url'
+
+# Chave do advisory lock que protege init_db
+ESQUEMA_LOCK_ID = 7210
+
+def init_db(levantar_erros=False):
+    """Inicializa o banco de dados e cria as tabelas se não existirem.
+
+    Com `levantar_erros`, uma falha é repassada a quem chamou em vez de só registrada.
+    """
+    conn = None
     try:
+        conn = get_db_connection()
         with conn.cursor() as cur:
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS clientes (
-                    id TEXT PRIMARY KEY,
-                    nome TEXT NOT NULL UNIQUE,
-                    config JSONB,
-                    data_criacao TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS feeds (
-                    id SERIAL PRIMARY KEY,
-                    cliente_id TEXT NOT NULL REFERENCES clientes(id) ON DELETE CASCADE,
-                    nome TEXT NOT NULL,
-                    url TEXT NOT NULL,
-                    tipo TEXT NOT NULL,
-                    categoria TEXT
-                )
-            ''')
+            # Serializa inicializações simultâneas (vários processos subindo juntos):
+            # quem chega depois espera e encontra o marcador já criado. O lock é
+            # liberado sozinho no fim da transação.
+            cur.execute('SELECT pg_advisory_xact_lock(%s)', (ESQUEMA_LOCK_ID,))
+            cur.execute('SELECT to_regclass(%s)', (ESQUEMA_MARCADOR,))
+            if cur.fetchone()[0] is not None:
+                logger.info("✅ Esquema do banco de dados já está atualizado.")
+                return
+
+            cur.execute(ESQUEMA_DDL)
+            # Com duplicatas antigas só o índice único é desfeito; as tabelas ficam
+            cur.execute('SAVEPOINT unicidade_feeds')
+            try:
+                cur.execute(ESQUEMA_UNICIDADE)
+            except psycopg2.Error as e:
+                cur.execute('ROLLBACK TO SAVEPOINT unicidade_feeds')
+                logger.error("❌ Índice único de feeds não foi criado: %s", e)
         conn.commit()
-        print("✅ Tabelas do banco de dados verificadas/criadas.")
+        logger.info("✅ Tabelas do banco de dados verificadas/criadas.")
     except psycopg2.Error as e:
-        print(f"❌ Erro ao inicializar o DB: {e}")
+        logger.error("❌ Erro ao inicializar o DB: %s", e)
+        if levantar_erros:
+            raise
     finally:
-        conn.close()
+        if conn:
+            conn.close()
+
+# --- GERAÇÃO DE IMAGEM ---
+
+IMG_LARGURA, IMG_ALTURA = 1080, 1080
+MARGEM = 50
+
+def baixar_arquivo_url(url, timeout=15):
+    """Baixa um arquivo (logo, fonte) e o devolve em memória."""
+    resposta = SESSION.get(url, timeout=timeout)
+    resposta.raise_for_status()
+    return io.BytesIO(resposta.content)
+
+# Logos e fontes só mudam quando o cliente reenvia o arquivo, e o Cloudinary gera
+# uma URL nova (versionada) a cada upload. Por isso a URL serve de chave do cache.
+ASSET_CACHE_DIR = os.getenv('ASSET_CACHE_DIR', '/tmp/asset_cache')
+
+def baixar_arquivo_com_cache(url):
+    """Como baixar_arquivo_url, mas mantém uma cópia em disco indexada pelo hash da URL."""
+    caminho = os.path.join(ASSET_CACHE_DIR, hashlib.sha256(url.encode()).hexdigest())
+    try:
+        with open(caminho, 'rb') as f:
+            return io.BytesIO(f.read())
+    except FileNotFoundError:
+        pass
+
+    arquivo = baixar_arquivo_url(url)
+    os.makedirs(ASSET_CACHE_DIR, exist_ok=True)
+    # Grava num temporário e renomeia para nunca deixar um arquivo pela metade no cache
+    temporario = f"{caminho}.{secrets.token_hex(4)}.tmp"
+    with open(temporario, 'wb') as f:
+        f.write(arquivo.getbuffer())
+    os.replace(temporario, caminho)
+    return arquivo
+
+@functools.lru_cache(maxsize=64)
+def carregar_fonte(url, tamanho):
+    """Carrega a fonte TrueType uma única vez por (URL, tamanho)."""
+    return ImageFont.truetype(baixar_arquivo_com_cache(url), tamanho)
+
+@functools.lru_cache(maxsize=32)
+def carregar_logo(url, tamanho):
+    """Decodifica o logo já em RGBA e reduzido, uma única vez por (URL, tamanho)."""
+    logo = Image.open(baixar_arquivo_com_cache(url)).convert('RGBA')
+    logo.thumbnail((tamanho, tamanho), Image.LANCZOS)
+    return logo
+
+@functools.lru_cache(maxsize=16)
+def montar_base(cor_fundo, logo_url, tamanho_logo, pos_logo):
+    """Fundo com o logo já aplicado; igual em todos os posts do cliente, muda só o texto.
+
+    Não altere a imagem retornada: ela é compartilhada, use .copy().
+    """
+    base = Image.new('RGB', (IMG_LARGURA, IMG_ALTURA), cor_fundo)
+    logo = carregar_logo(logo_url, tamanho_logo)
+    base.paste(logo, pos_logo, logo)
+    return base, logo.height
+
+def quebrar_texto(texto, fonte, largura_max):
+    """Quebra o texto em linhas que caibam em `largura_max` pixels com a fonte dada."""
+    largura_espaco = fonte.getlength(' ')
+    linhas, linha_atual, largura_atual = [], [], 0
+    for palavra in texto.split():
+        largura_palavra = fonte.getlength(palavra)
+        if linha_atual and largura_atual + largura_espaco + largura_palavra > largura_max:
+            linhas.append(' '.join(linha_atual))
+            linha_atual, largura_atual = [palavra], largura_palavra
+        else:
+            if linha_atual:
+                largura_atual += largura_espaco
+            linha_atual.append(palavra)
+            largura_atual += largura_palavra
+    if linha_atual:
+        linhas.append(' '.join(linha_atual))
+    return linhas
+
+def desenhar_linhas(draw, y, linhas, fonte, altura_linha, cor):
+    """Desenha as linhas com um único multiline_text, `altura_linha` px entre o topo de
+    cada uma. Retorna o y logo abaixo do bloco."""
+    if not linhas:
+        return y
+    # O multiline_text soma `spacing` à altura de "A" na fonte
+    espacamento = altura_linha - draw.textbbox((0, 0), 'A', font=fonte)[3]
+    draw.multiline_text((MARGEM, y), '\n'.join(linhas), font=fonte, fill=cor, spacing=espacamento)
+    return y + len(linhas) * altura_linha
+
+def gerar_imagem_noticia(titulo, texto, config):
+    """Gera a arte 1080x1080 da notícia com a identidade visual do cliente."""
+    tamanho_titulo = int(config.get('tamanho_fonte_titulo') or 60)
+    tamanho_texto = int(config.get('tamanho_fonte_texto') or 40)
+    tamanho_logo = int(config.get('tamanho_logo') or 200)
+    pos_logo = (int(config.get('pos_logo_x') or MARGEM), int(config.get('pos_logo_y') or MARGEM))
+
+    # Logo e fontes ficam no Cloudinary: o que não estiver em cache é obtido em paralelo
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futuro_base = executor.submit(montar_base, config.get('cor_fundo') or '#ffffff',
+                                      config['logo_url'], tamanho_logo, pos_logo)
+        futuro_titulo = executor.submit(carregar_fonte, config['font_url_titulo'], tamanho_titulo)
+        futuro_texto = executor.submit(carregar_fonte, config['font_url_texto'], tamanho_texto)
+        base, altura_logo = futuro_base.result()
+        fonte_titulo = futuro_titulo.result()
+        fonte_texto = futuro_texto.result()
+
+    imagem = base.copy()
+    draw = ImageDraw.Draw(imagem)
+
+    largura_max = IMG_LARGURA - 2 * MARGEM
+    y_text = pos_logo[1] + altura_logo + MARGEM
+
+    y_text = desenhar_linhas(draw, y_text, quebrar_texto(titulo, fonte_titulo, largura_max),
+                             fonte_titulo, tamanho_titulo + 10,
+                             config.get('cor_texto_titulo') or '#000000')
+
+    # O resumo dos feeds costuma vir em HTML
+    texto = BeautifulSoup(texto, 'html.parser').get_text(' ', strip=True)
+    y_text += MARGEM
+    # Só entram as linhas que terminam antes da margem inferior
+    altura_linha = tamanho_texto + 10
+    cabem = max(0, (IMG_ALTURA - MARGEM - tamanho_texto - y_text) // altura_linha + 1)
+    desenhar_linhas(draw, y_text, quebrar_texto(texto, fonte_texto, largura_max)[:cabem],
+                    fonte_texto, altura_linha, config.get('cor_texto_noticia') or '#333333')
+
+    return imagem
+
+# --- CACHE DE CONFIGURAÇÃO ---
+
+REDIS_URL = os.getenv('REDIS_URL')
+# Timeouts curtos: um Redis travado vira cache vazio em vez de prender as threads
+REDIS_TIMEOUT = float(os.getenv('REDIS_TIMEOUT', 0.5))
+redis_client = redis.Redis.from_url(REDIS_URL, socket_timeout=REDIS_TIMEOUT,
+                                    socket_connect_timeout=REDIS_TIMEOUT) if redis and REDIS_URL else None
+
+class _CacheTTL:
+    """Base dos caches abaixo: guarda valores com TTL no Redis, se configurado,
+    ou num dicionário em memória do processo.
+
+    Com Redis o cache é compartilhado entre os workers e a invalidação vale
+    para todos. Falhas do Redis são registradas e tratadas como cache vazio.
+    """
+
+    def __init__(self, ttl, redis_client=None):
+        self.ttl = ttl
+        self._redis = redis_client
+        self._entradas = {}
+        self._lock = threading.Lock()
+
+    def _ler(self, chave):
+        if self._redis is None:
+            entrada = self._entradas.get(chave)
+            return entrada[1] if entrada and entrada[0] > time.monotonic() else None
+        try:
+            bruto = self._redis.get(chave)
+        except redis.RedisError as e:
+            logger.warning("Redis indisponível, lendo do banco: %s", e)
+            return None
+        return orjson.loads(bruto) if bruto else None
+
+    def _gravar(self, chave, valor):
+        if self._redis is None:
+            with self._lock:
+                self._entradas[chave] = (time.monotonic() + self.ttl, valor)
+            return
+        try:
+            self._redis.setex(chave, self.ttl, orjson.dumps(valor))
+        except redis.RedisError as e:
+            logger.warning("Não foi possível gravar no Redis: %s", e)
+
+    def _apagar(self, chave):
+        if self._redis is None:
+            with self._lock:
+                self._entradas.pop(chave, None)
+            return
+        try:
+            self._redis.delete(chave)
+        except redis.RedisError as e:
+            logger.error("Falha ao invalidar %s no Redis: %s", chave, e)
+
+class ClientConfigCache(_CacheTTL):
+    """Cache da linha (nome, config) de cada cliente.
+
+    A configuração só muda pelo painel, então as páginas podem reaproveitá-la
+    sem consultar o banco a cada acesso. Quem altera a linha deve chamar
+    invalidate() logo após o commit.
+    """
+
+    def __init__(self, ttl=60, redis_client=None):
+        super().__init__(ttl, redis_client)
+
+    def get(self, cliente_id, conn):
+        """Retorna {'nome': ..., 'config': {...}} ou None se o cliente não existir."""
+        chave = f"cliente:{cliente_id}"
+        cliente = self._ler(chave)
+        if cliente is not None:
+            return cliente
+
+        with conn.cursor() as cur:
+            cur.execute("SELECT nome, config FROM clientes WHERE id = %s", (cliente_id,))
+            row = cur.fetchone()
+        if not row:
+            return None
+
+        nome, config = row
+        cliente = {'nome': nome, 'config': config or {}}
+        self._gravar(chave, cliente)
+        return cliente
+
+    def invalidate(self, cliente_id):
+        self._apagar(f"cliente:{cliente_id}")
+
+class ClientListCache(_CacheTTL):
+    """Cache da lista (id, nome) de clientes exibida na tela de login.
+
+    A lista só muda quando um cliente é criado ou renomeado; nesses casos
+    chame invalidate() após o commit.
+    """
+
+    CHAVE = 'clientes:lista'
+
+    def __init__(self, ttl=30, redis_client=None):
+        super().__init__(ttl, redis_client)
+
+    def get(self, conn):
+        clientes = self._ler(self.CHAVE)
+        if clientes is not None:
+            return clientes
+
+        with conn.cursor() as cur:
+            cur.execute('SELECT id, nome FROM clientes ORDER BY nome')
+            clientes = [{'id': id_, 'nome': nome} for id_, nome in cur.fetchall()]
+        self._gravar(self.CHAVE, clientes)
+        return clientes
+
+    def invalidate(self):
+        self._apagar(self.CHAVE)
+
+config_cache = ClientConfigCache(redis_client=redis_client)
+clientes_cache = ClientListCache(ttl=3600 if redis_client else 30, redis_client=redis_client)
 
 # --- ROTAS PRINCIPAIS ---
 
+# Entra no ETag do dashboard para que um deploy com templates novos não seja
+# respondido com 304 a partir do HTML antigo em cache no navegador.
+ETAG_VERSAO = os.getenv('RENDER_GIT_COMMIT', '')
+
+def etag_corresponde(etag):
+    """Diz se o If-None-Match da requisição contém `etag`.
+
+    O Flask-Compress acrescenta ':br'/':gzip' ao ETag das respostas comprimidas,
+    então é esse valor que o navegador devolve; o sufixo é ignorado na comparação.
+    """
+    return any(tag.split(':', 1)[0] == etag for tag in request.if_none_match.as_set(include_weak=True))
+
 @app.route('/')
 def dashboard():
     if 'cliente_id' not in session:
         return redirect(url_for('login'))
     
     cliente_id = session['cliente_id']
-    conn = get_db_connection()
     try:
-        with conn.cursor(cursor_factory=DictCursor) as cur:
-            cur.execute("SELECT nome, config FROM clientes WHERE id = %s", (cliente_id,))
-            cliente = cur.fetchone()
+        with db_conn() as conn:
+            cliente = config_cache.get(cliente_id, conn)
 
-        if not cliente:
-            session.clear()
-            flash("Cliente não encontrado. Por favor, faça login novamente.", "warning")
-            return redirect(url_for('login'))
+            if not cliente:
+                session.clear()
+                flash("Cliente não encontrado. Por favor, faça login novamente.", "warning")
+                return redirect(url_for('login'))
 
-        with conn.cursor(cursor_factory=DictCursor) as cur:
-            cur.execute("SELECT * FROM feeds WHERE cliente_id = %s ORDER BY nome", (cliente_id,))
-            feeds = cur.fetchall()
+            with conn.cursor(cursor_factory=DictCursor) as cur:
+                cur.execute("SELECT id, nome, url, tipo, categoria FROM feeds WHERE cliente_id = %s ORDER BY nome",
+                            (cliente_id,))
+                feeds = cur.fetchall()
         
-        config_cliente = cliente['config'] or {}
+        config_cliente = cliente['config']
         # Uma verificação mais robusta da configuração
         config_completa = all(config_cliente.get(k) for k in ['logo_url', 'font_url_titulo'])
 
     except psycopg2.Error as e:
         flash(f"Erro de banco de dados ao carregar o dashboard: {e}", "danger")
         return redirect(url_for('login'))
-    finally:
-        conn.close()
-    
-    return render_template('dashboard.html', config=config_cliente, feeds=feeds, config_completa=config_completa)
+
+    # Sem mensagens flash pendentes a página depende só do cliente, da config e dos
+    # feeds: num reload o navegador manda If-None-Match e recebe 304 sem renderizar.
+    etag = None
+    if '_flashes' not in session:
+        conteudo = orjson.dumps([ETAG_VERSAO, cliente_id, config_cliente, [tuple(f) for f in feeds]])
+        etag = hashlib.blake2b(conteudo, digest_size=16).hexdigest()
+
+    if etag and etag_corresponde(etag):
+        resposta = make_response('', 304)
+    else:
+        resposta = make_response(render_template('dashboard.html', config=config_cliente, feeds=feeds,
+                                                 config_completa=config_completa))
+    if etag:
+        resposta.set_etag(etag)
+        resposta.headers['Cache-Control'] = 'private, no-cache'
+    return resposta
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -109,28 +538,19 @@ def login():
             return redirect(url_for('login'))
         
         # Verifica se o cliente realmente existe antes de criar a sessão
-        conn = get_db_connection()
-        try:
-            with conn.cursor() as cur:
-                cur.execute("SELECT id FROM clientes WHERE id = %s", (cliente_id,))
-                if cur.fetchone():
-                    session['cliente_id'] = cliente_id
-                    return redirect(url_for('dashboard'))
-                else:
-                    flash("Cliente selecionado não é válido.", "danger")
-        finally:
-            conn.close()
+        with db_conn() as conn:
+            if config_cache.get(cliente_id, conn):
+                session['cliente_id'] = cliente_id
+                return redirect(url_for('dashboard'))
+            else:
+                flash("Cliente selecionado não é válido.", "danger")
 
-    conn = get_db_connection()
     try:
-        with conn.cursor(cursor_factory=DictCursor) as cur:
-            cur.execute('SELECT id, nome FROM clientes ORDER BY nome')
-            clientes = cur.fetchall()
+        with db_conn() as conn:
+            clientes = clientes_cache.get(conn)
     except psycopg2.Error as e:
         flash(f"Não foi possível carregar a lista de clientes: {e}", "danger")
         clientes = []
-    finally:
-        conn.close()
 
     return render_template('login.html', clientes=clientes)
 
@@ -150,14 +570,15 @@ def adicionar_cliente():
             flash("O nome do cliente não pode ser vazio.", "danger")
             return render_template('adicionar_cliente.html')
 
-        novo_id = f"cliente_{uuid.uuid4().hex[:8]}"
+        novo_id = f"cliente_{secrets.token_hex(4)}"
         config_inicial = {'nome': nome_cliente}
-        conn = get_db_connection()
         try:
-            with conn.cursor() as cur:
-                cur.execute("INSERT INTO clientes (id, nome, config) VALUES (%s, %s, %s)",
-                            (novo_id, nome_cliente, json.dumps(config_inicial)))
-            conn.commit()
+            with db_conn() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("INSERT INTO clientes (id, nome, config) VALUES (%s, %s, %s)",
+                                (novo_id, nome_cliente, orjson.dumps(config_inicial).decode()))
+                conn.commit()
+            clientes_cache.invalidate()
             flash(f"Cliente '{nome_cliente}' criado com sucesso! Faça o login.", "success")
             return redirect(url_for('login'))
         except psycopg2.IntegrityError:
@@ -166,11 +587,131 @@ def adicionar_cliente():
         except psycopg2.Error as e:
             flash(f"Erro de banco de dados: {e}", "danger")
             return render_template('adicionar_cliente.html')
-        finally:
-            conn.close()
         
     return render_template('adicionar_cliente.html')
 
+# Campos simples do formulário de configuração, gravados no JSONB `config`
+CAMPOS_CONFIG = ['cor_fundo', 'cor_texto_titulo', 'cor_texto_noticia', 'tamanho_fonte_titulo',
+                 'tamanho_fonte_texto', 'tamanho_logo', 'pos_logo_x', 'pos_logo_y']
+# Campos que a geração de imagem converte com int(); só aceitam inteiros positivos
+CAMPOS_NUMERICOS = {'tamanho_fonte_titulo', 'tamanho_fonte_texto', 'tamanho_logo', 'pos_logo_x', 'pos_logo_y'}
+
+# Arquivos enviados ao Cloudinary: campo do formulário -> (chave no config, resource_type)
+ARQUIVOS_CONFIG = {
+    'logo': ('logo_url', 'image'),
+    'fonte_titulo': ('font_url_titulo', 'raw'),
+    'fonte_texto': ('font_url_texto', 'raw'),
+}
+
+UPLOAD_CHUNK_SIZE = 6 * 1024 * 1024
+
+# Limite do corpo da requisição (logo + duas fontes). O Werkzeug recusa o excesso
+# enquanto lê o stream, antes de gravar qualquer coisa em disco ou memória.
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_MB', 20)) * 1024 * 1024
+
+@app.errorhandler(413)
+def upload_grande_demais(e):
+    limite_mb = app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+    # As rotas /api/ são chamadas via fetch e esperam JSON, não um redirect
+    if request.path.startswith('/api/'):
+        return jsonify(sucesso=False, erro=f'A requisição passa do limite de {limite_mb} MB.'), 413
+    if request.endpoint != 'configurar':
+        return e
+    flash(f"Os arquivos enviados passam do limite de {limite_mb} MB.", "danger")
+    return redirect(url_for('configurar'))
+
+@app.route('/configurar', methods=['GET', 'POST'])
+def configurar():
+    if 'cliente_id' not in session:
+        return redirect(url_for('login'))
+
+    cliente_id = session['cliente_id']
+
+    if request.method == 'POST':
+        nome = request.form.get('nome', '').strip()
+        if not nome:
+            flash("O nome do cliente não pode ser vazio.", "danger")
+            return redirect(url_for('configurar'))
+
+        # Só as chaves enviadas entram no patch; o merge é feito pelo Postgres
+        patch = {'nome': nome}
+        for campo in CAMPOS_CONFIG:
+            valor = request.form.get(campo, '').strip()
+            if not valor:
+                continue
+            if campo in CAMPOS_NUMERICOS:
+                valor = int(valor) if valor.isdigit() else 0
+                if valor <= 0:
+                    flash(f"O campo '{campo}' deve ser um número inteiro positivo.", "danger")
+                    return redirect(url_for('configurar'))
+            patch[campo] = valor
+
+        envios = {}
+        try:
+            # Logo e fontes sobem em paralelo: o tempo total é o do maior arquivo
+            with ThreadPoolExecutor(max_workers=len(ARQUIVOS_CONFIG)) as executor:
+                for campo, (chave, resource_type) in ARQUIVOS_CONFIG.items():
+                    arquivo = request.files.get(campo)
+                    if arquivo and arquivo.filename:
+                        # Envia em partes direto do stream do upload, sem copiar o arquivo
+                        # inteiro para a memória
+                        arquivo.stream.seek(0)
+                        envios[chave] = executor.submit(
+                            cloudinary.uploader.upload_large,
+                            arquivo.stream,
+                            filename=arquivo.filename,
+                            chunk_size=UPLOAD_CHUNK_SIZE,
+                            folder=f"automacao/{cliente_id}",
+                            resource_type=resource_type
+                        )
+            for chave, futuro in envios.items():
+                resultado = futuro.result()
+                # upload_large não envia nada (e retorna None) para um arquivo vazio
+                if not resultado:
+                    flash("Um dos arquivos enviados está vazio.", "danger")
+                    return redirect(url_for('configurar'))
+                patch[chave] = resultado['secure_url']
+        except cloudinary.exceptions.Error as e:
+            flash(f"Erro ao enviar arquivo para o Cloudinary: {e}", "danger")
+            return redirect(url_for('configurar'))
+
+        try:
+            with db_conn() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "UPDATE clientes SET nome = %s, config = COALESCE(config, '{}'::jsonb) || %s::jsonb "
+                        "WHERE id = %s",
+                        (nome, orjson.dumps(patch).decode(), cliente_id)
+                    )
+                conn.commit()
+            config_cache.invalidate(cliente_id)
+            clientes_cache.invalidate()
+            flash("Configurações salvas com sucesso!", "success")
+            return redirect(url_for('dashboard'))
+        except psycopg2.IntegrityError:
+            flash(f"Já existe um cliente com o nome '{nome}'.", "danger")
+        except psycopg2.Error as e:
+            flash(f"Erro de banco de dados: {e}", "danger")
+        return redirect(url_for('configurar'))
+
+    # Lê direto do banco, sem o config_cache: o formulário é reenviado inteiro no
+    # POST, e uma cópia velha de outro worker desfaria a última alteração salva.
+    try:
+        with db_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT config FROM clientes WHERE id = %s", (cliente_id,))
+                row = cur.fetchone()
+    except psycopg2.Error as e:
+        flash(f"Erro de banco de dados ao carregar as configurações: {e}", "danger")
+        return redirect(url_for('dashboard'))
+
+    if not row:
+        session.clear()
+        flash("Cliente não encontrado. Por favor, faça login novamente.", "warning")
+        return redirect(url_for('login'))
+
+    return render_template('configurar.html', config=row[0] or {})
+
 @app.route('/api/adicionar-feed', methods=['POST'])
 def api_adicionar_feed():
     if 'cliente_id' not in session:
@@ -183,49 +724,86 @@ def api_adicionar_feed():
     if not all([nome, url, tipo]):
         return jsonify(sucesso=False, erro='Nome, URL e Tipo são obrigatórios.'), 400
 
-    conn = get_db_connection()
     try:
-        with conn.cursor() as cur:
-            cur.execute(
-                "INSERT INTO feeds (cliente_id, nome, url, tipo, categoria) VALUES (%s, %s, %s, %s, %s)",
-                (cliente_id, nome, url, tipo, dados.get('categoria'))
-            )
-        conn.commit()
+        with db_conn() as conn:
+            inserir_feeds(conn, [(cliente_id, nome, url, tipo, dados.get('categoria'))])
+            conn.commit()
         return jsonify(sucesso=True, mensagem='Feed adicionado com sucesso!')
+    except psycopg2.IntegrityError as e:
+        # Só a violação do índice único (cliente_id, url) é um feed repetido; chave
+        # estrangeira, NOT NULL etc. seguem como erro de banco comum
+        if e.pgcode == psycopg2.errorcodes.UNIQUE_VIOLATION:
+            return jsonify(sucesso=False, erro='Este feed já está cadastrado.'), 409
+        return jsonify(sucesso=False, erro=f'Erro de banco de dados: {e}'), 500
+    except psycopg2.Error as e:
+        return jsonify(sucesso=False, erro=f'Erro de banco de dados: {e}'), 500
+
+# Tipos que o auto_post sabe processar
+TIPOS_FEED = {'rss', 'json'}
+
+@app.route('/api/adicionar-feeds', methods=['POST'])
+def api_adicionar_feeds():
+    """Cadastra vários feeds de uma vez a partir de uma lista JSON."""
+    if 'cliente_id' not in session:
+        return jsonify(sucesso=False, erro='Sessão expirada. Faça login novamente.'), 401
+
+    cliente_id = session['cliente_id']
+    feeds = request.get_json(silent=True)
+    if not isinstance(feeds, list) or not feeds:
+        return jsonify(sucesso=False, erro='Envie uma lista JSON de feeds.'), 400
+
+    linhas = []
+    for feed in feeds:
+        if not isinstance(feed, dict) or not all(isinstance(feed.get(k), str) and feed[k]
+                                                 for k in ('nome', 'url', 'tipo')):
+            return jsonify(sucesso=False, erro='Cada feed precisa de nome, url e tipo (texto).'), 400
+        if feed.get('categoria') is not None and not isinstance(feed['categoria'], str):
+            return jsonify(sucesso=False, erro='A categoria do feed deve ser texto.'), 400
+        if feed['tipo'] not in TIPOS_FEED:
+            return jsonify(sucesso=False, erro=f"Tipo de feed inválido: {feed['tipo']}. Use 'rss' ou 'json'."), 400
+        linhas.append((cliente_id, feed['nome'], feed['url'], feed['tipo'], feed.get('categoria')))
+
+    try:
+        with db_conn() as conn:
+            inseridos = inserir_feeds(conn, linhas, ignorar_duplicados=True)
+            conn.commit()
+        return jsonify(sucesso=True, mensagem=f'{inseridos} feed(s) adicionado(s).',
+                       inseridos=inseridos, ignorados=len(linhas) - inseridos)
     except psycopg2.Error as e:
         return jsonify(sucesso=False, erro=f'Erro de banco de dados: {e}'), 500
-    finally:
-        conn.close()
 
 @app.route('/api/remover-feed/<int:feed_id>', methods=['POST'])
 def api_remover_feed(feed_id):
     if 'cliente_id' not in session:
         return jsonify(sucesso=False, erro='Sessão expirada.'), 401
 
-    conn = get_db_connection()
     try:
-        with conn.cursor() as cur:
-            cur.execute("DELETE FROM feeds WHERE id = %s AND cliente_id = %s", (feed_id, session['cliente_id']))
-        conn.commit()
+        with db_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM feeds WHERE id = %s AND cliente_id = %s", (feed_id, session['cliente_id']))
+            conn.commit()
         if cur.rowcount > 0:
             return jsonify(sucesso=True, mensagem='Feed removido!')
         else:
             return jsonify(sucesso=False, erro='Feed não encontrado ou não pertence a você.'), 404
     except psycopg2.Error as e:
         return jsonify(sucesso=False, erro=f'Erro de banco de dados: {e}'), 500
-    finally:
-        conn.close()
 
 
 # --- INICIALIZAÇÃO ---
 
+def aquecer_templates():
+    """Compila todos os templates de uma vez, para a primeira requisição não pagar o parse."""
+    for nome in app.jinja_env.list_templates():
+        app.jinja_env.get_template(nome)
+
 def initialize_app():
-    """Função para ser chamada no comando de build do Render."""
-    print("🚀 Executando inicialização da aplicação...")
+    """Prepara o banco. Chamada pelo master do Gunicorn ao subir (on_starting) ou no build do Render."""
+    logger.info("🚀 Executando inicialização da aplicação...")
     init_db()
 
 if __name__ == '__main__':
     initialize_app()
     port = int(os.environ.get('PORT', 5000))
-    # Para testes locais, debug=True é útil. No Render, ele desliga sozinho.
-    app.run(host='0.0.0.0', port=port, debug=True)
+    # Servidor de desenvolvimento apenas. Em produção use o Gunicorn (gunicorn.conf.py).
+    app.run(host='0.0.0.0', port=port, debug=os.getenv('FLASK_DEBUG') == '1')
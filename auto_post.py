@@ -1,19 +1,27 @@
 import os
-import json
+import io
+import orjson
+import logging
 import feedparser
 import requests
-import uuid
-from time import sleep
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from app import get_db_connection, gerar_imagem_noticia # Importa funções do app.py
+from app import get_db_connection, gerar_imagem_noticia, init_db, SESSION # Importa funções do app.py
 import cloudinary
 import cloudinary.uploader
 import psycopg2
-from psycopg2.extras import DictCursor
+from psycopg2.extras import DictCursor, execute_values
 
 # Carrega variáveis de ambiente
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Configuração do Cloudinary
 cloudinary.config(
     cloud_name=os.getenv('CLOUDINARY_CLOUD_NAME'),
@@ -21,12 +29,69 @@ cloudinary.config(
     api_secret=os.getenv('CLOUDINARY_API_SECRET')
 )
 
-# Arquivo para armazenar links já postados (para fins de backup local)
-# A fonte da verdade será o banco de dados
-POSTED_LOG_FILE = 'posted_links.log' 
+# Encode JPEG via libjpeg-turbo (SIMD) quando a biblioteca do sistema estiver
+# disponível; caso contrário usa o encoder do Pillow.
+try:
+    import numpy as np
+    from turbojpeg import TurboJPEG, TJPF_RGB, TJSAMP_420, TJFLAG_PROGRESSIVE
+    _turbojpeg = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    _turbojpeg = None
+
+JPEG_QUALIDADE = 85
+
+# Quantos feeds são baixados ao mesmo tempo (o trabalho é quase todo espera de rede)
+FEED_WORKERS = int(os.getenv('FEED_WORKERS', 8))
+# (conexão, leitura) em segundos: host fora do ar falha rápido, feed lento ainda tem tempo
+FEED_TIMEOUT = (3, 10)
+
+# Sessão própria dos feeds, com keep-alive. Ao contrário da SESSION do app.py, falhas
+# de conexão e de leitura não são repetidas: um host fora do ar custa só FEED_TIMEOUT
+# e o feed é tentado de novo na próxima rodada. Respostas 429/5xx ainda são repetidas.
+FEED_SESSION = requests.Session()
+_feed_adapter = HTTPAdapter(
+    pool_connections=FEED_WORKERS,
+    pool_maxsize=FEED_WORKERS,
+    max_retries=Retry(total=3, connect=0, read=0, other=0, backoff_factor=2,
+                      status_forcelist=(429, 500, 502, 503, 504))
+)
+FEED_SESSION.mount('http://', _feed_adapter)
+FEED_SESSION.mount('https://', _feed_adapter)
+FEED_SESSION.headers.update(SESSION.headers)
+# Quantas imagens sobem para o Cloudinary ao mesmo tempo
+UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', 4))
+
+class LimiteDeTaxa:
+    """Token bucket thread-safe: libera até `taxa` chamadas por segundo, com rajadas
+    de até `taxa` chamadas (no mínimo uma). Só bloqueia quando as fichas acabam."""
+
+    def __init__(self, taxa):
+        if taxa <= 0:
+            raise ValueError(f"A taxa deve ser positiva, recebido {taxa}.")
+        self.taxa = taxa
+        # Com taxa < 1 o balde ainda precisa comportar uma ficha inteira
+        self.capacidade = max(1.0, float(taxa))
+        self._fichas = self.capacidade
+        self._atualizado = time.monotonic()
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._fichas = min(self.capacidade, self._fichas + (agora - self._atualizado) * self.taxa)
+                self._atualizado = agora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return
+                espera = (1 - self._fichas) / self.taxa
+            time.sleep(espera)
+
+# Teto de envios ao Cloudinary, compartilhado por todas as threads de upload
+limite_uploads = LimiteDeTaxa(float(os.getenv('UPLOADS_POR_SEGUNDO', 5)))
 
-def carregar_links_postados_db(conn):
-    """Carrega links postados a partir de uma tabela no DB."""
+def criar_tabela_links_postados(conn):
+    """Garante a tabela de links já postados (o índice único de `link` faz a deduplicação)."""
     with conn.cursor() as cur:
         cur.execute("""
             CREATE TABLE IF NOT EXISTS links_postados (
@@ -35,15 +100,35 @@ def carregar_links_postados_db(conn):
                 data_postagem TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
             )
         """)
-        cur.execute("SELECT link FROM links_postados")
-        links = {row[0] for row in cur.fetchall()}
     conn.commit()
-    return links
 
-def salvar_link_postado_db(conn, link):
-    """Salva um novo link no banco de dados."""
+def filtrar_posts_novos(conn, posts):
+    """Remove os posts cujo link já foi publicado; a diferença é feita no Postgres."""
+    if not posts:
+        return posts
     with conn.cursor() as cur:
-        cur.execute("INSERT INTO links_postados (link) VALUES (%s) ON CONFLICT (link) DO NOTHING", (link,))
+        novos = execute_values(
+            cur,
+            "WITH cand(link) AS (VALUES %s) "
+            "SELECT c.link FROM cand c LEFT JOIN links_postados p USING (link) WHERE p.link IS NULL",
+            [(post['link'],) for post in posts],
+            fetch=True,
+            page_size=len(posts),
+        )
+    links_novos = {row[0] for row in novos}
+    return [post for post in posts if post['link'] in links_novos]
+
+def salvar_links_postados_db(conn, links):
+    """Salva de uma vez, num único INSERT, os links já postados."""
+    if not links:
+        return
+    with conn.cursor() as cur:
+        execute_values(
+            cur,
+            "INSERT INTO links_postados (link) VALUES %s ON CONFLICT (link) DO NOTHING",
+            [(link,) for link in links],
+            page_size=500
+        )
     conn.commit()
 
 def verificar_configuracao_completa(config):
@@ -51,14 +136,38 @@ def verificar_configuracao_completa(config):
     essenciais = ['nome', 'logo_url', 'font_url_titulo', 'font_url_texto']
     return all(key in config and config[key] for key in essenciais)
 
-def processar_feed_rss(feed_url, links_postados):
-    """Busca e processa notícias de um feed RSS."""
-    print(f"  Processando RSS: {feed_url}")
+def codificar_jpeg(imagem):
+    """Codifica a imagem gerada em JPEG progressivo (arquivo menor, exibição gradual)."""
+    if imagem.mode != 'RGB':
+        imagem = imagem.convert('RGB')
+    if _turbojpeg is not None:
+        return _turbojpeg.encode(np.asarray(imagem), quality=JPEG_QUALIDADE,
+                                 pixel_format=TJPF_RGB, jpeg_subsample=TJSAMP_420,
+                                 flags=TJFLAG_PROGRESSIVE)
+
+    buffer = io.BytesIO()
+    imagem.save(buffer, format='JPEG', quality=JPEG_QUALIDADE, subsampling=2,
+                optimize=True, progressive=True)
+    return buffer.getvalue()
+
+def enviar_para_cloudinary(jpeg, cliente_id):
+    """Envia o JPEG do post ao Cloudinary e retorna a URL pública."""
+    limite_uploads.aguardar()
+    upload_result = cloudinary.uploader.upload(
+        io.BytesIO(jpeg),
+        folder=f"automacao/{cliente_id}/posts_gerados",
+        public_id=f"post_{secrets.token_hex(6)}"
+    )
+    return upload_result.get('secure_url')
+
+def processar_feed_rss(response, feed_url):
+    """Processa as notícias de um feed RSS já baixado. Retorna None se não der para ler o feed."""
+    logger.debug("  Processando RSS: %s", feed_url)
     try:
-        noticias = feedparser.parse(feed_url)
+        noticias = feedparser.parse(response.content)
         if noticias.bozo:
-            print(f"    AVISO: Erro ao parsear o feed. Pode estar mal formatado. {noticias.bozo_exception}")
-            return []
+            logger.warning("    AVISO: Erro ao parsear o feed. Pode estar mal formatado. %s", noticias.bozo_exception)
+            return None
 
         novos_posts = []
         for entry in noticias.entries:
@@ -69,29 +178,26 @@ def processar_feed_rss(feed_url, links_postados):
             if not all([link, titulo, texto]):
                 continue
 
-            if link not in links_postados:
-                novos_posts.append({'titulo': titulo, 'texto': texto, 'link': link})
+            novos_posts.append({'titulo': titulo, 'texto': texto, 'link': link})
         
         return novos_posts
         
     except Exception as e:
-        print(f"    ERRO: Falha ao buscar ou processar feed RSS {feed_url}. Erro: {e}")
-        return []
+        logger.error("    ERRO: Falha ao processar feed RSS %s. Erro: %s", feed_url, e)
+        return None
 
-def processar_feed_json(feed_url, links_postados):
-    """Busca e processa notícias de um feed JSON."""
-    print(f"  Processando JSON: {feed_url}")
+def processar_feed_json(response, feed_url):
+    """Processa as notícias de um feed JSON já baixado. Retorna None se não der para ler o feed."""
+    logger.debug("  Processando JSON: %s", feed_url)
     try:
-        response = requests.get(feed_url, timeout=10)
-        response.raise_for_status()
-        noticias = response.json()
+        noticias = orjson.loads(response.content)
 
         novos_posts = []
         items = noticias.get('items') or noticias.get('articles') or noticias
 
         if not isinstance(items, list):
-            print("    ERRO: O JSON não contém uma lista de notícias.")
-            return []
+            logger.error("    ERRO: O JSON não contém uma lista de notícias.")
+            return None
 
         for item in items:
             link = item.get('link') or item.get('url')
@@ -101,110 +207,187 @@ def processar_feed_json(feed_url, links_postados):
             if not all([link, titulo, texto]):
                 continue
 
-            if link not in links_postados:
-                novos_posts.append({'titulo': titulo, 'texto': texto, 'link': link})
+            novos_posts.append({'titulo': titulo, 'texto': texto, 'link': link})
         
         return novos_posts
 
-    except requests.RequestException as e:
-        print(f"    ERRO: Falha ao buscar feed JSON {feed_url}. Erro: {e}")
-        return []
-    except json.JSONDecodeError:
-        print(f"    ERRO: O conteúdo de {feed_url} não é um JSON válido.")
-        return []
+    except orjson.JSONDecodeError:
+        logger.error("    ERRO: O conteúdo de %s não é um JSON válido.", feed_url)
+        return None
     except Exception as e:
-        print(f"    ERRO: Ocorreu um erro inesperado ao processar o JSON. Erro: {e}")
-        return []
+        logger.error("    ERRO: Ocorreu um erro inesperado ao processar o JSON. Erro: %s", e)
+        return None
+
+def buscar_feed(feed):
+    """Baixa o feed e o encaminha para o processador do tipo dele.
+
+    Retorna (notícias do feed, validadores), onde validadores é o dict com o
+    ETag/Last-Modified da resposta, ou None se não houve conteúdo novo.
+    """
+    # GET condicional: se nada mudou desde a última busca o servidor responde 304
+    # sem corpo, e o feed nem é processado
+    headers = {}
+    if feed['etag']:
+        headers['If-None-Match'] = feed['etag']
+    if feed['last_modified']:
+        headers['If-Modified-Since'] = feed['last_modified']
+    try:
+        # Baixa pela sessão dos feeds (keep-alive) em vez do urllib interno do feedparser
+        response = FEED_SESSION.get(feed['url'], timeout=FEED_TIMEOUT, headers=headers)
+        if response.status_code == 304:
+            logger.debug("    Feed sem alterações desde a última busca: %s", feed['url'])
+            return [], None
+        response.raise_for_status()
+    except requests.RequestException as e:
+        logger.error("    ERRO: Falha ao buscar feed %s. Erro: %s", feed['url'], e)
+        return [], None
 
+    if feed['tipo'] == 'rss':
+        novos_posts = processar_feed_rss(response, feed['url'])
+    elif feed['tipo'] == 'json':
+        novos_posts = processar_feed_json(response, feed['url'])
+    else:
+        return [], None
+    # Corpo ilegível (truncado, mal formatado...): os validadores não são guardados,
+    # senão as próximas buscas receberiam 304 e o feed nunca seria relido
+    if novos_posts is None:
+        return [], None
+    validadores = {'etag': response.headers.get('ETag'),
+                   'last_modified': response.headers.get('Last-Modified')}
+    return novos_posts, validadores
+
+def salvar_validadores_feed(conn, feed_id, validadores):
+    """Guarda o ETag/Last-Modified da última busca do feed para o próximo GET condicional."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO feed_cache (feed_id, etag, last_modified) VALUES (%s, %s, %s)
+            ON CONFLICT (feed_id) DO UPDATE SET etag = EXCLUDED.etag, last_modified = EXCLUDED.last_modified
+        """, (feed_id, validadores['etag'], validadores['last_modified']))
+    conn.commit()
 
 def iniciar_automacao():
     """Função principal que roda o robô de postagem."""
-    print("🤖 Iniciando robô de postagem automática...")
-    
+    logger.info("🤖 Iniciando robô de postagem automática...")
+
+    # O robô pode rodar antes do painel ter subido alguma vez: garante o esquema
+    # (feeds, feed_cache...) que a consulta abaixo usa. Sem ele nada seria publicado,
+    # então uma falha aqui interrompe a rodada em vez de virar só uma linha de log.
+    init_db(levantar_erros=True)
+
     conn = None
+    executor = ThreadPoolExecutor(max_workers=FEED_WORKERS)
+    upload_executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS)
+    # Links postados que ainda não foram gravados; vão ao banco ao fim de cada feed
+    links_pendentes = []
     try:
         conn = get_db_connection()
-        links_postados = carregar_links_postados_db(conn)
-        print(f"Carregados {len(links_postados)} links já postados do banco de dados.")
+        criar_tabela_links_postados(conn)
 
+        # Clientes e feeds numa única consulta, agrupados por cliente
+        clientes = {}
         with conn.cursor(cursor_factory=DictCursor) as cur:
-            cur.execute('SELECT id, config FROM clientes')
-            clientes = cur.fetchall()
+            cur.execute('''
+                SELECT c.id AS cliente_id, c.config, f.id, f.url, f.tipo, fc.etag, fc.last_modified
+                FROM clientes c
+                LEFT JOIN feeds f ON f.cliente_id = c.id
+                LEFT JOIN feed_cache fc ON fc.feed_id = f.id
+                ORDER BY c.id, f.id
+            ''')
+            for row in cur:
+                cliente = clientes.setdefault(row['cliente_id'], {'config': row['config'] or {}, 'feeds': []})
+                if row['id'] is not None:
+                    cliente['feeds'].append(row)
         
         if not clientes:
-            print("Nenhum cliente encontrado no banco de dados. Encerrando.")
+            logger.info("Nenhum cliente encontrado no banco de dados. Encerrando.")
             return
 
-        for cliente in clientes:
-            cliente_id = cliente['id']
-            config_cliente = cliente['config'] or {}
+        # Os feeds de todos os clientes entram no pool de uma vez: o download total
+        # leva o tempo do feed mais lento, não a soma do mais lento de cada cliente.
+        # A geração e o envio das imagens continuam cliente a cliente logo abaixo.
+        buscas = {
+            cliente_id: [executor.submit(buscar_feed, feed) for feed in cliente['feeds']]
+            for cliente_id, cliente in clientes.items()
+            if cliente['feeds'] and verificar_configuracao_completa(cliente['config'])
+        }
+
+        for cliente_id, cliente in clientes.items():
+            config_cliente = cliente['config']
+            feeds = cliente['feeds']
                 
             nome_cliente = config_cliente.get('nome', cliente_id)
-            print(f"\n➡️  Verificando cliente: {nome_cliente}")
+            logger.info("➡️  Verificando cliente: %s", nome_cliente)
 
             if not verificar_configuracao_completa(config_cliente):
-                print("  Configuração do cliente está incompleta (faltam logo, fontes, etc). Pulando.")
+                logger.warning("  Configuração do cliente está incompleta (faltam logo, fontes, etc). Pulando.")
                 continue
 
-            with conn.cursor(cursor_factory=DictCursor) as cur:
-                cur.execute('SELECT * FROM feeds WHERE cliente_id = %s', (cliente_id,))
-                feeds = cur.fetchall()
-            
             if not feeds:
-                print("  Nenhum feed RSS/JSON cadastrado para este cliente.")
+                logger.info("  Nenhum feed RSS/JSON cadastrado para este cliente.")
                 continue
 
-            for feed in feeds:
-                posts_para_gerar = []
-                if feed['tipo'] == 'rss':
-                    posts_para_gerar = processar_feed_rss(feed['url'], links_postados)
-                elif feed['tipo'] == 'json':
-                    posts_para_gerar = processar_feed_json(feed['url'], links_postados)
+            resultados = [futuro.result() for futuro in buscas[cliente_id]]
 
+            for feed, (posts_do_feed, validadores) in zip(feeds, resultados):
+                # A deduplicação fica no banco: só os links deste feed são consultados
+                posts_para_gerar = filtrar_posts_novos(conn, posts_do_feed)
                 if not posts_para_gerar:
-                    print(f"    Nenhuma notícia nova encontrada em {feed['url']}.")
+                    logger.debug("    Nenhuma notícia nova encontrada em %s.", feed['url'])
+                    if validadores:
+                        salvar_validadores_feed(conn, feed['id'], validadores)
                     continue
 
-                print(f"    ✅ Encontradas {len(posts_para_gerar)} notícias novas!")
+                logger.info("    ✅ Encontradas %d notícias novas!", len(posts_para_gerar))
                 
+                # As imagens são geradas aqui, em sequência, e cada uma segue para o
+                # Cloudinary em segundo plano enquanto a próxima é desenhada
+                envios = []
                 for post in reversed(posts_para_gerar):
                     try:
-                        print(f"      Gerando imagem para: '{post['titulo'][:50]}...'")
-                        
+                        logger.debug("      Gerando imagem para: '%s...'", post['titulo'][:50])
                         imagem = gerar_imagem_noticia(post['titulo'], post['texto'], config_cliente)
-                        
-                        # Salva a imagem em memória para enviar ao Cloudinary
-                        img_byte_arr = io.BytesIO()
-                        imagem.save(img_byte_arr, format='PNG')
-                        img_byte_arr.seek(0)
-
-                        # Envia para o Cloudinary
-                        upload_result = cloudinary.uploader.upload(
-                            img_byte_arr,
-                            folder=f"automacao/{cliente_id}/posts_gerados",
-                            public_id=f"post_{uuid.uuid4().hex[:12]}"
-                        )
-                        
-                        image_url = upload_result.get('secure_url')
-                        print(f"      ✅ Imagem enviada para o Cloudinary: {image_url}")
-                        
-                        # TODO: Adicionar aqui a lógica para postar a `image_url` nas redes sociais
-                        
-                        salvar_link_postado_db(conn, post['link'])
-                        links_postados.add(post['link'])
-                        
-                        sleep(2)
-
+                        # Codifica a imagem em memória (JPEG) para enviar ao Cloudinary
+                        jpeg = codificar_jpeg(imagem)
                     except Exception as e:
-                        print(f"      ❌ ERRO CRÍTICO ao gerar ou enviar imagem para '{post['titulo']}'. Erro: {e}")
+                        logger.error("      ❌ ERRO CRÍTICO ao gerar imagem para '%s'. Erro: %s", post['titulo'], e)
                         break
+                    envios.append((upload_executor.submit(enviar_para_cloudinary, jpeg, cliente_id), post))
+
+                # Resultados na ordem de envio (mais antiga primeiro), para a publicação
+                # nas redes seguir a ordem das notícias; os uploads continuam simultâneos
+                for futuro, post in envios:
+                    try:
+                        image_url = futuro.result()
+                    except Exception as e:
+                        logger.error("      ❌ ERRO CRÍTICO ao enviar imagem para '%s'. Erro: %s", post['titulo'], e)
+                        continue
+                    logger.info("      ✅ Imagem enviada para o Cloudinary: %s", image_url)
+
+                    # TODO: Adicionar aqui a lógica para postar a `image_url` nas redes sociais
+
+                    links_pendentes.append(post['link'])
+
+                salvar_links_postados_db(conn, links_pendentes)
+                # Só marca o feed como visto se todas as notícias foram publicadas; senão o
+                # próximo GET condicional receberia 304 e as que falharam se perderiam
+                if validadores and len(links_pendentes) == len(posts_para_gerar):
+                    salvar_validadores_feed(conn, feed['id'], validadores)
+                links_pendentes.clear()
     
     except (psycopg2.Error, ValueError) as e:
-        print(f"ERRO DE BANCO DE DADOS: {e}")
+        logger.error("ERRO DE BANCO DE DADOS: %s", e)
     finally:
+        executor.shutdown(wait=False)
+        upload_executor.shutdown(wait=False)
         if conn:
+            # Não perde o registro do que já foi publicado se a execução parou no meio
+            try:
+                conn.rollback()  # descarta uma transação abortada por erro anterior
+                salvar_links_postados_db(conn, links_pendentes)
+            except psycopg2.Error as e:
+                logger.error("Falha ao gravar links postados: %s", e)
             conn.close()
-        print("\n🏁 Robô finalizou a verificação.")
+        logger.info("🏁 Robô finalizou a verificação.")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,26 @@
+# Configuração do Gunicorn (carregada automaticamente a partir do diretório
+# do projeto). Comando de start no Render: gunicorn app:app
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# O trabalho das rotas é majoritariamente I/O (Postgres, Cloudinary), então
+# poucos processos com várias threads cada aproveitam melhor a máquina.
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+
+# Evita que o heartbeat dos workers escreva em disco.
+worker_tmp_dir = '/dev/shm'
+
+# Importa o app uma vez no master; os workers herdam módulos, templates
+# compilados e caches via fork (copy-on-write) em vez de refazer tudo.
+# O pool do Postgres é criado sob demanda, então nenhuma conexão é herdada.
+preload_app = True
+
+def on_starting(server):
+    # Verifica/cria o esquema e compila os templates uma vez, no master,
+    # antes de qualquer worker subir
+    from app import initialize_app, aquecer_templates
+    initialize_app()
+    aquecer_templates()
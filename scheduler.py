@@ -0,0 +1,28 @@
+import os
+import time
+import logging
+from auto_post import iniciar_automacao  # Importa app.py/Pillow uma única vez
+
+logger = logging.getLogger(__name__)
+
+# Intervalo entre verificações, contado do início de uma rodada ao início da próxima
+INTERVALO_MINUTOS = float(os.getenv('AUTO_POST_INTERVALO_MIN', 5))
+
+
+def executar_em_loop():
+    """Processo de longa duração que roda o robô a cada INTERVALO_MINUTOS."""
+    intervalo = INTERVALO_MINUTOS * 60
+    logger.info("⏰ Agendador iniciado: rodando a cada %s min.", INTERVALO_MINUTOS)
+    while True:
+        inicio = time.monotonic()
+        try:
+            iniciar_automacao()
+        except Exception:
+            # Uma rodada com erro não derruba o agendador
+            logger.exception("Rodada do robô falhou")
+        # Se a rodada demorou mais que o intervalo, a próxima começa em seguida
+        time.sleep(max(0, intervalo - (time.monotonic() - inicio)))
+
+
+if __name__ == '__main__':
+    executar_em_loop()
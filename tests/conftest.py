@@ -0,0 +1,55 @@
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module  # noqa: E402
+
+
+class CursorFalso:
+    """Cursor que devolve sempre as mesmas linhas, sem banco de verdade."""
+
+    def __init__(self, linhas):
+        self.linhas = linhas
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchall(self):
+        return self.linhas
+
+
+class ConexaoFalsa:
+    def __init__(self, linhas):
+        self.linhas = linhas
+
+    def cursor(self, **kwargs):
+        return CursorFalso(self.linhas)
+
+
+@pytest.fixture
+def cliente_logado(monkeypatch):
+    """Test client com sessão de um cliente e banco/cache substituídos por dados fixos."""
+    feeds = [[i, f'Feed {i}', f'http://feed/{i}', 'rss', 'geral'] for i in range(30)]
+
+    @contextmanager
+    def db_conn():
+        yield ConexaoFalsa(feeds)
+
+    monkeypatch.setattr(app_module, 'db_conn', db_conn)
+    monkeypatch.setattr(app_module.config_cache, 'get',
+                        lambda cliente_id, conn: {'nome': 'Teste', 'config': {'nome': 'Teste'}})
+
+    client = app_module.app.test_client()
+    with client.session_transaction() as sessao:
+        sessao['cliente_id'] = 'cliente_teste'
+    return client
@@ -0,0 +1,34 @@
+import app as app_module
+
+
+def contar_renderizacoes(monkeypatch):
+    chamadas = []
+    original = app_module.render_template
+
+    def render_template(*args, **kwargs):
+        chamadas.append(args[0])
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(app_module, 'render_template', render_template)
+    return chamadas
+
+
+def test_reload_comprimido_com_etag_igual_nao_renderiza(cliente_logado, monkeypatch):
+    primeira = cliente_logado.get('/', headers={'Accept-Encoding': 'br'})
+    assert primeira.status_code == 200
+    etag = primeira.headers['ETag']
+    assert etag.endswith(':br"')
+
+    chamadas = contar_renderizacoes(monkeypatch)
+    resposta = cliente_logado.get('/', headers={'Accept-Encoding': 'br', 'If-None-Match': etag})
+
+    assert resposta.status_code == 304
+    assert chamadas == []
+
+
+def test_etag_diferente_renderiza(cliente_logado, monkeypatch):
+    chamadas = contar_renderizacoes(monkeypatch)
+    resposta = cliente_logado.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': '"outro:gzip"'})
+
+    assert resposta.status_code == 200
+    assert chamadas == ['dashboard.html']